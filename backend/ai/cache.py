@@ -0,0 +1,206 @@
+"""
+Cache Module
+In-process caches used to skip repeated Azure round-trips on the request path.
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+
+class TTLCache:
+    """Bounded exact-match LRU cache whose entries expire after a fixed TTL."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        """
+        Initialize an empty cache.
+
+        Args:
+            maxsize: Maximum number of cached entries
+            ttl: Entry lifetime in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        """Cache value under key, evicting the least recently used entry if full."""
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove key and return its value, or None if it was not cached."""
+        entry = self._entries.pop(key, None)
+        return entry[1] if entry is not None else None
+
+    def cache_info(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "maxsize": self.maxsize,
+            "currsize": len(self._entries)
+        }
+
+
+class SemanticCache:
+    """
+    Cosine-similarity cache over L2-normalized query embeddings.
+
+    Entries live in a FAISS inner-product index with a parallel list of payloads.
+    When the cache is full, the entry with the lowest blend of usage frequency and
+    recency (alpha * usage + (1 - alpha) * exp(-age / beta)) is evicted.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        maxlen: int = 500,
+        alpha: float = 0.6,
+        beta: float = 300.0
+    ):
+        """
+        Initialize an empty semantic cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a lookup to count as a hit
+            maxlen: Maximum number of cached entries
+            alpha: Weight of usage frequency versus recency in the eviction score
+            beta: Recency decay constant in seconds
+        """
+        self.threshold = threshold
+        self.maxlen = maxlen
+        self.alpha = alpha
+        self.beta = beta
+        self._index = None
+        self._payloads: List[Any] = []
+        self._usage: List[int] = []
+        self._last_used: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.array(embedding, dtype="float32").reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def lookup(self, embedding) -> Optional[Any]:
+        """
+        Return the payload of the most similar cached query, if similar enough.
+
+        Args:
+            embedding: Query embedding
+
+        Returns:
+            Cached payload, or None on a miss
+        """
+        if not self._payloads:
+            return None
+
+        scores, ids = self._index.search(self._normalize(embedding), 1)
+        idx = int(ids[0][0])
+        if idx < 0 or scores[0][0] < self.threshold:
+            return None
+
+        self._usage[idx] += 1
+        self._last_used[idx] = time.monotonic()
+        return self._payloads[idx]
+
+    def add(self, embedding, payload: Any):
+        """
+        Cache a payload under a query embedding, evicting if the cache is full.
+
+        Args:
+            embedding: Query embedding
+            payload: Value returned by later similar lookups
+        """
+        vector = self._normalize(embedding)
+        if self._index is None:
+            self._index = faiss.IndexFlatIP(vector.shape[1])
+
+        if len(self._payloads) >= self.maxlen:
+            self._evict()
+
+        self._index.add(vector)
+        self._payloads.append(payload)
+        self._usage.append(1)
+        self._last_used.append(time.monotonic())
+
+    def _evict(self):
+        """Remove the entry with the lowest usage/recency score."""
+        now = time.monotonic()
+        max_usage = max(self._usage)
+        scores = [
+            self.alpha * (usage / max_usage)
+            + (1 - self.alpha) * math.exp(-(now - last_used) / self.beta)
+            for usage, last_used in zip(self._usage, self._last_used)
+        ]
+        idx = scores.index(min(scores))
+
+        # IndexFlat compacts ids on removal, matching del on the parallel lists
+        self._index.remove_ids(np.array([idx], dtype="int64"))
+        del self._payloads[idx]
+        del self._usage[idx]
+        del self._last_used[idx]
+
+
+class ResponseCache:
+    """
+    Semantic cache of generated responses, kept separate per routing mode.
+
+    Uses a higher similarity threshold than the retrieval cache, since a hit
+    returns a full answer rather than source documents.
+    """
+
+    MODES = ("balanced", "cost", "quality")
+
+    def __init__(self, threshold: float = 0.95, maxlen: int = 500):
+        """
+        Initialize an empty response cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a lookup to count as a hit
+            maxlen: Maximum number of cached responses per mode
+        """
+        self._caches = {
+            mode: SemanticCache(threshold=threshold, maxlen=maxlen)
+            for mode in self.MODES
+        }
+
+    def lookup(self, embedding, mode: str) -> Optional[Tuple]:
+        """Return the cached (response_text, model_chosen, citations) for a similar query."""
+        cache = self._caches.get(mode)
+        if cache is None:
+            return None
+        return cache.lookup(embedding)
+
+    def add(self, embedding, mode: str, payload: Tuple):
+        """Cache a (response_text, model_chosen, citations) payload for a query."""
+        cache = self._caches.get(mode)
+        if cache is not None:
+            cache.add(embedding, payload)
@@ -0,0 +1,86 @@
+"""
+Embeddings Module
+Embeds user queries with an Azure OpenAI embedding deployment for semantic caching.
+"""
+import asyncio
+import logging
+import os
+from typing import Optional
+
+import numpy as np
+
+from ai.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+
+class QueryEmbedder:
+    """Embeds query text using an Azure OpenAI embedding deployment."""
+
+    def __init__(self, client, deployment: str):
+        """
+        Initialize the embedder.
+
+        Args:
+            client: Configured async Azure OpenAI client
+            deployment: Embedding deployment name (e.g. text-embedding-3-small)
+        """
+        self.client = client
+        self.deployment = deployment
+        # Recent and in-flight embeddings, so the retrieval and response caches
+        # share one embedding call per message
+        self._recent = TTLCache(maxsize=256, ttl=60.0)
+
+    @classmethod
+    def from_env(cls, client) -> Optional["QueryEmbedder"]:
+        """Build an embedder if a client and embedding deployment are configured."""
+        deployment = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "")
+        if client is None or not deployment:
+            return None
+        return cls(client, deployment)
+
+    async def embed(self, text: str) -> Optional[np.ndarray]:
+        """
+        Embed a query.
+
+        Args:
+            text: Query text
+
+        Returns:
+            Float32 embedding vector, or None if the embedding call failed
+        """
+        try:
+            response = await self.client.embeddings.create(
+                model=self.deployment,
+                input=text
+            )
+            return np.array(response.data[0].embedding, dtype="float32")
+        except Exception as e:
+            logger.warning("Embedding error: %s", e, exc_info=True)
+            return None
+
+    async def aembed(self, text: str) -> Optional[np.ndarray]:
+        """
+        Embed a query, sharing the request with other callers.
+
+        Concurrent and repeated calls for the same text share a single request.
+
+        Args:
+            text: Query text
+
+        Returns:
+            Float32 embedding vector, or None if the embedding call failed
+        """
+        task = self._recent.get(text)
+        if task is None:
+            task = asyncio.ensure_future(self.embed(text))
+            self._recent.set(text, task)
+            task.add_done_callback(lambda done: self._forget_failed(text, done))
+        # Shield so one cancelled caller does not cancel the shared request
+        return await asyncio.shield(task)
+
+    def _forget_failed(self, text: str, task: asyncio.Future):
+        """Drop a finished request that produced no embedding, so the next call retries."""
+        if task.cancelled() or task.exception() is not None or task.result() is None:
+            self._recent.pop(text)
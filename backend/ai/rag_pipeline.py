@@ -2,33 +2,176 @@
 RAG Pipeline Module
 Implements Retrieval-Augmented Generation for clinical queries using Azure AI Search.
 """
+import logging
 import os
-from typing import List, Dict, Optional
-from azure.search.documents import SearchClient
+import re
+from typing import AsyncIterator, List, Dict, Optional
+from azure.search.documents.aio import SearchClient
 from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import AioHttpTransport
+
+from ai.cache import SemanticCache, TTLCache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+# Matches [Source N] citations in generated responses
+_CITATION_RE = re.compile(r'\[Source (\d+)\]')
+
+# Prompt templates, parsed once at import and filled with a single .format call
+_DOC_TMPL = "[Source {i}: {title}]\n{content}\n".format
+
+_PROMPT_TMPL = """You are a helpful healthcare assistant. Answer the following question based on the provided medical knowledge base sources.
+
+IMPORTANT GUIDELINES:
+1. Base your answer on the provided sources
+2. Include citations in the format [Source N] where N is the source number
+3. If the sources don't contain sufficient information, clearly state this
+4. Always include a disclaimer that this is for educational purposes only
+5. Never provide diagnostic conclusions or specific medical advice
+6. Encourage users to consult healthcare professionals
+
+MEDICAL KNOWLEDGE BASE SOURCES:
+{context}
+
+USER QUESTION:
+{user_query}
+
+Please provide a helpful, well-cited response with appropriate medical disclaimers."""
+
+_FALLBACK_PROMPT_TMPL = """You are a helpful healthcare assistant. Answer the following question to the best of your ability.
+
+IMPORTANT GUIDELINES:
+1. Provide general, educational information only
+2. Never provide diagnostic conclusions or specific medical advice
+3. Always encourage users to consult healthcare professionals
+4. Include appropriate medical disclaimers
+
+USER QUESTION:
+{user_query}
+
+Please provide a helpful response with appropriate medical disclaimers."""
 
 
 class RAGPipeline:
     """Retrieval-Augmented Generation pipeline for clinical knowledge."""
     
-    def __init__(self):
-        """Initialize Azure AI Search client."""
-        search_endpoint = os.getenv("SEARCH_ENDPOINT", "")
-        search_key = os.getenv("SEARCH_KEY", "")
-        search_index = os.getenv("SEARCH_INDEX_NAME", "medical-kb")
-        
-        if search_endpoint and search_key:
-            self.search_client = SearchClient(
-                endpoint=search_endpoint,
-                index_name=search_index,
-                credential=AzureKeyCredential(search_key)
+    def __init__(self, embedder=None):
+        """
+        Initialize Azure AI Search client.
+        
+        Args:
+            embedder: Optional QueryEmbedder enabling the semantic retrieval cache
+        """
+        self.search_endpoint = os.getenv("SEARCH_ENDPOINT", "")
+        self.search_key = os.getenv("SEARCH_KEY", "")
+        self.search_index = os.getenv("SEARCH_INDEX_NAME", "medical-kb")
+        self.enabled = bool(self.search_endpoint and self.search_key)
+        self.search_client = None
+        self._connect()
+        
+        # Exact-match cache: repeated queries skip the search round-trip
+        self.search_cache = TTLCache(
+            maxsize=1024,
+            ttl=float(os.getenv("SEARCH_CACHE_TTL", "300"))
+        )
+        
+        # Semantic cache: similar queries reuse earlier search results
+        self.embedder = embedder
+        if embedder is not None:
+            self.semantic_cache = SemanticCache(
+                threshold=float(os.getenv("RAG_SEMANTIC_CACHE_THRESHOLD", "0.9")),
+                maxlen=500
             )
-            self.enabled = True
         else:
-            self.search_client = None
-            self.enabled = False
+            self.semantic_cache = None
+    
+    def _connect(self):
+        """Create the search client and its pooled transport."""
+        self._closed = False
+        if not self.enabled:
+            return
+        
+        self.search_client = SearchClient(
+            endpoint=self.search_endpoint,
+            index_name=self.search_index,
+            credential=AzureKeyCredential(self.search_key),
+            # One transport (and aiohttp session) keeps connections alive across requests
+            transport=AioHttpTransport(
+                connection_timeout=5,
+                read_timeout=10,
+                connection_verify=True
+            )
+        )
+    
+    def open(self):
+        """
+        Recreate the search client if close() has closed it.
+        
+        Called at app startup, so a second lifespan (tests, uvicorn reload) does
+        not search through a closed transport.
+        """
+        if self._closed:
+            self._connect()
+    
+    async def prewarm(self):
+        """Open the search connection (TLS + auth) before the first user query."""
+        if not self.enabled or not self.search_client:
+            return
+        
+        try:
+            await self.search_client.get_document_count()
+        except Exception as e:
+            logger.warning("Search prewarm failed: %s", e)
+    
+    async def close(self):
+        """Close the search client and its connection pool."""
+        if self.search_client:
+            await self.search_client.close()
+        self._closed = True
     
-    def retrieve_documents(
+    async def retrieve_documents_stream(
+        self,
+        query: str,
+        top_k: int = 3
+    ) -> AsyncIterator[Dict]:
+        """
+        Yield documents from the medical knowledge base as result pages arrive.
+        
+        Iteration stops after top_k documents, so no further pages are fetched.
+        
+        Args:
+            query: Search query
+            top_k: Number of documents to retrieve
+        
+        Yields:
+            Retrieved documents with content and metadata
+        """
+        if not self.enabled or not self.search_client:
+            return
+        
+        results = await self.search_client.search(
+            search_text=query,
+            top=top_k,
+            select=["content", "title", "source", "category"]
+        )
+        
+        # Selected fields are always present on results, so subscript directly
+        count = 0
+        async for page in results.by_page():
+            async for result in page:
+                yield {
+                    "content": result["content"],
+                    "title": result["title"],
+                    "source": result["source"],
+                    "category": result["category"],
+                    "score": result["@search.score"]
+                }
+                count += 1
+                if count >= top_k:
+                    return
+    
+    async def retrieve_documents(
         self,
         query: str,
         top_k: int = 3
@@ -46,29 +189,43 @@ class RAGPipeline:
         if not self.enabled or not self.search_client:
             return []
         
+        cache_key = (query, top_k)
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
+        embedding = None
+        if self.semantic_cache is not None:
+            embedding = await self.embedder.aembed(query)
+            if embedding is not None:
+                cached = self.semantic_cache.lookup(embedding)
+                if cached is not None and cached[0] == top_k:
+                    self.search_cache.set(cache_key, cached[1])
+                    return list(cached[1])
+        
         try:
-            results = self.search_client.search(
-                search_text=query,
-                top=top_k,
-                select=["content", "title", "source", "category"]
-            )
+            documents = [
+                doc async for doc in self.retrieve_documents_stream(query, top_k)
+            ]
             
-            documents = []
-            for result in results:
-                documents.append({
-                    "content": result.get("content", ""),
-                    "title": result.get("title", ""),
-                    "source": result.get("source", ""),
-                    "category": result.get("category", ""),
-                    "score": result.get("@search.score", 0.0)
-                })
+            if documents:
+                self.search_cache.set(cache_key, tuple(documents))
+                if embedding is not None:
+                    self.semantic_cache.add(embedding, (top_k, tuple(documents)))
             
             return documents
             
         except Exception as e:
-            print(f"Search error: {str(e)}")
+            logger.warning("Search failed: %s", e)
             return []
     
+    def cache_info(self) -> Dict:
+        """Return hit/miss statistics for the retrieval caches."""
+        info = {"search_cache": self.search_cache.cache_info()}
+        if self.semantic_cache is not None:
+            info["semantic_cache"] = {"currsize": len(self.semantic_cache)}
+        return info
+    
     def build_rag_prompt(
         self,
         user_query: str,
@@ -88,49 +245,16 @@ class RAGPipeline:
             return self._build_fallback_prompt(user_query)
         
         # Build context from documents
-        context_parts = []
-        for i, doc in enumerate(documents, 1):
-            context_parts.append(
-                f"[Source {i}: {doc['title']}]\n{doc['content']}\n"
-            )
-        
-        context = "\n".join(context_parts)
+        context = "\n".join(
+            _DOC_TMPL(i=i, title=doc["title"], content=doc["content"])
+            for i, doc in enumerate(documents, 1)
+        )
         
-        # Build augmented prompt
-        prompt = f"""You are a helpful healthcare assistant. Answer the following question based on the provided medical knowledge base sources.
-
-IMPORTANT GUIDELINES:
-1. Base your answer on the provided sources
-2. Include citations in the format [Source N] where N is the source number
-3. If the sources don't contain sufficient information, clearly state this
-4. Always include a disclaimer that this is for educational purposes only
-5. Never provide diagnostic conclusions or specific medical advice
-6. Encourage users to consult healthcare professionals
-
-MEDICAL KNOWLEDGE BASE SOURCES:
-{context}
-
-USER QUESTION:
-{user_query}
-
-Please provide a helpful, well-cited response with appropriate medical disclaimers."""
-        
-        return prompt
+        return _PROMPT_TMPL.format(context=context, user_query=user_query)
     
     def _build_fallback_prompt(self, user_query: str) -> str:
         """Build prompt when RAG is unavailable."""
-        return f"""You are a helpful healthcare assistant. Answer the following question to the best of your ability.
-
-IMPORTANT GUIDELINES:
-1. Provide general, educational information only
-2. Never provide diagnostic conclusions or specific medical advice
-3. Always encourage users to consult healthcare professionals
-4. Include appropriate medical disclaimers
-
-USER QUESTION:
-{user_query}
-
-Please provide a helpful response with appropriate medical disclaimers."""
+        return _FALLBACK_PROMPT_TMPL.format(user_query=user_query)
     
     def extract_citations(self, response: str, documents: List[Dict]) -> Dict:
         """
@@ -143,13 +267,11 @@ Please provide a helpful response with appropriate medical disclaimers."""
         Returns:
             Dict with formatted citations
         """
-        import re
-        
         # Find all [Source N] citations in response
-        citations = re.findall(r'\[Source (\d+)\]', response)
+        citations = {m.group(1) for m in _CITATION_RE.finditer(response)}
         
         formatted_citations = {}
-        for citation_num in set(citations):
+        for citation_num in citations:
             idx = int(citation_num) - 1
             if 0 <= idx < len(documents):
                 doc = documents[idx]
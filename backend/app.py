@@ -4,31 +4,179 @@ Backend API for intelligent healthcare triage using Foundry Model Router.
 """
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
-import base64
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, field_validator
+from typing import Optional, Dict, Any, Awaitable, Callable
+from contextlib import asynccontextmanager
 import asyncio
-from io import BytesIO
-from PIL import Image
+import hashlib
+import io
+import logging
+import os
+import traceback
+import uvicorn
+import orjson
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Console logging for application modules; routing telemetry is written by
+# router_observability's own queued handlers
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
 from intent_detector import IntentDetector
 from phi_redactor import PHIRedactor
 from guardrails import Guardrails
-from foundry_client import FoundryClient
+from foundry_client import get_client
 from router_observability import RouterObservability
 from ai.rag_pipeline import RAGPipeline
+from ai.embeddings import QueryEmbedder
+from ai.cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+# Upper bound on the base64 image string, and on the whole request body
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(8 * 1024 * 1024)))
+MAX_REQUEST_BYTES = MAX_IMAGE_BYTES + 64 * 1024
+
+# Startup waits at most this long (seconds) for connection prewarming
+PREWARM_TIMEOUT = float(os.getenv("PREWARM_TIMEOUT", "10"))
+
+# Initialize clients
+foundry_client = get_client()
+query_embedder = QueryEmbedder.from_env(foundry_client.azure_client)
+rag_pipeline = RAGPipeline(embedder=query_embedder)
+observability = RouterObservability()
+
+
+# Vision prompt template, parsed once at import
+_VISION_PROMPT_TMPL = """Analyze this medical image and provide an educational description.
+
+User Question: {message}
+
+Please provide:
+1. A detailed description of what you observe
+2. Educational information about relevant anatomy or conditions
+3. Appropriate confidence levels and limitations
+4. Safety language emphasizing this is not a diagnostic tool
+
+Remember: This is for educational purposes only, not for diagnosis."""
+
+
+class RequestCoalescer:
+    """Shares one in-flight result among concurrent identical requests."""
+    
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+    
+    @staticmethod
+    def make_key(message: str, mode: str, image: Optional[str]) -> str:
+        """Build a coalescing key from the redacted message, mode, and image."""
+        digest = hashlib.sha256()
+        for part in (message, mode, image or ""):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+    
+    def is_inflight(self, key: str) -> bool:
+        """Return whether a request with this key is currently running."""
+        return key in self._inflight
+    
+    async def run(self, key: str, factory: Callable[[], Awaitable]) -> Any:
+        """
+        Run factory() for key, or join the identical request already in flight.
+        
+        Args:
+            key: Coalescing key from make_key
+            factory: Creates the coroutine to run when no request is in flight
+        
+        Returns:
+            The shared result; exceptions propagate to every waiter
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one disconnecting caller does not cancel the shared call
+        return await asyncio.shield(future)
+
+
+coalescer = RequestCoalescer()
+
+# Semantic response cache: highly similar text queries reuse a prior answer
+if query_embedder is not None:
+    response_cache = ResponseCache(
+        threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+    )
+else:
+    response_cache = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prewarm outbound connections at startup and release them at shutdown."""
+    # The previous lifespan (tests, uvicorn reload) may have closed the pool
+    foundry_client.open()
+    rag_pipeline.open()
+    if query_embedder is not None:
+        query_embedder.client = foundry_client.azure_client
+    # Prewarming is best-effort, so an unreachable upstream cannot hold up startup
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(rag_pipeline.prewarm(), foundry_client.prewarm()),
+            timeout=PREWARM_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Prewarm did not finish within %.0fs, starting anyway", PREWARM_TIMEOUT)
+    yield
+    await rag_pipeline.close()
+    await foundry_client.aclose()
+
 
 app = FastAPI(
     title="Care Triage API",
     description="Intelligent healthcare triage assistant using Foundry Model Router",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-# Configure CORS
+
+class RequestSizeLimitMiddleware:
+    """Reject requests whose declared body size exceeds a limit with 413."""
+    
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                    response = ORJSONResponse(
+                        status_code=413,
+                        content={"detail": "Request body too large"}
+                    )
+                    await response(scope, receive, send)
+                    return
+        await self.app(scope, receive, send)
+
+
+# Refuse oversized bodies before they are read, decoded, and validated
+app.add_middleware(RequestSizeLimitMiddleware, max_bytes=MAX_REQUEST_BYTES)
+
+# Compress JSON responses (response text, telemetry, citations) for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=5)
+
+# Configure CORS. Added last so it is the outermost middleware and its headers
+# also reach responses produced by the layers above, such as the 413.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://localhost:5174", "http://localhost:3000"],  # Vite default ports
@@ -37,17 +185,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize clients
-foundry_client = FoundryClient()
-rag_pipeline = RAGPipeline()
-observability = RouterObservability()
-
 
 class ChatRequest(BaseModel):
     """Chat request model."""
     message: str
     mode: str = "balanced"  # balanced | cost | quality
     image: Optional[str] = None  # Base64 encoded image
+    
+    @field_validator("image")
+    @classmethod
+    def check_image_size(cls, value: Optional[str]) -> Optional[str]:
+        """Reject images larger than MAX_IMAGE_BYTES (e.g. chunked uploads)."""
+        if value is not None and len(value) > MAX_IMAGE_BYTES:
+            raise ValueError(f"Image exceeds {MAX_IMAGE_BYTES} bytes")
+        return value
 
 
 class ChatResponse(BaseModel):
@@ -73,10 +224,14 @@ async def test():
     """Test endpoint to verify OpenAI connection."""
     try:
         messages = [{"role": "user", "content": "Say 'test successful' in 3 words."}]
-        response_text, telemetry = foundry_client.call_router(messages=messages, mode="balanced", max_tokens=50, temperature=0.7)
+        response_text, telemetry = await foundry_client.call_router(
+            messages=messages,
+            mode="balanced",
+            max_tokens=50,
+            temperature=0.7
+        )
         return {"status": "success", "response": response_text, "telemetry": telemetry}
     except Exception as e:
-        import traceback
         return {"status": "error", "error": str(e), "traceback": traceback.format_exc()}
 
 
@@ -97,6 +252,7 @@ async def chat(request: ChatRequest):
     - Vision-capable model selection when images are present
     - Intelligent routing to appropriate underlying models
     """
+    rag_task = None
     try:
         original_message = request.message
         mode = request.mode
@@ -112,44 +268,74 @@ async def chat(request: ChatRequest):
                 phi_types
             )
         
-        # Step 2: Safety Guardrails
-        is_safe, warning_message, safety_metadata = Guardrails.check_safety(redacted_message)
+        # Start RAG retrieval speculatively so the search round-trip overlaps with
+        # the checks below; it is cancelled if the request does not need it
+        if not has_image and rag_pipeline.enabled:
+            rag_task = asyncio.create_task(
+                rag_pipeline.retrieve_documents(redacted_message, top_k=3)
+            )
+        
+        # Steps 2-3: Safety Guardrails and Intent Detection (for logging and
+        # disclaimers only) both depend only on the redacted message, so run them
+        # concurrently off the event loop
+        (is_safe, warning_message, safety_metadata), (intent, intent_reason) = await asyncio.gather(
+            asyncio.to_thread(Guardrails.check_safety, redacted_message),
+            asyncio.to_thread(IntentDetector.detect_intent, redacted_message, has_image)
+        )
         
         if not is_safe:
             observability.log_error(
                 "safety_violation",
                 "Request blocked by guardrails",
-                {"risk_level": safety_metadata.get("risk_level")}
+                {"risk_level": safety_metadata.get("risk_level"), "intent": intent}
             )
             raise HTTPException(status_code=400, detail=warning_message)
         
-        # Step 3: Intent Detection (for logging and disclaimers only)
-        intent, intent_reason = IntentDetector.detect_intent(redacted_message, has_image)
-        
         # Step 4: Generate Response (Model Router handles all routing automatically)
-        response_text = ""
-        telemetry = {}
-        citations = None
+        # Check the response cache before retrieval and the model call
+        cached = None
+        cache_status = None
+        if response_cache is not None and not has_image:
+            query_embedding = await query_embedder.aembed(redacted_message)
+            if query_embedding is not None:
+                cached = response_cache.lookup(query_embedding, mode)
+                cache_status = "hit" if cached is not None else "miss"
         
-        if has_image and request.image:
-            # Vision path - Model Router detects image and routes to vision-capable model
-            response_text, telemetry = await handle_vision_request(
-                message=redacted_message,
-                image_data=request.image,
-                mode=mode
-            )
-        elif intent == "clinical":
-            # Clinical path with RAG - Model Router handles quality optimization
-            response_text, telemetry, citations = await handle_clinical_request(
-                message=redacted_message,
-                mode=mode
-            )
+        if cached is not None:
+            # Cache hit - no retrieval or model call, so no tokens or model latency
+            if rag_task is not None:
+                rag_task.cancel()
+            response_text, model_chosen, citations = cached
+            telemetry = {
+                "model_chosen": model_chosen,
+                "tokens": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                "latency_ms": 0.0,
+                "endpoint": "response_cache"
+            }
         else:
-            # Admin or general path - Model Router handles cost/balanced optimization
-            response_text, telemetry = await handle_general_request(
-                message=redacted_message,
-                mode=mode
-            )
+            # Identical concurrent requests share a single upstream model call
+            coalesce_key = RequestCoalescer.make_key(redacted_message, mode, request.image)
+            if rag_task is not None and coalescer.is_inflight(coalesce_key):
+                rag_task.cancel()
+            
+            async def generate() -> tuple:
+                result = await generate_response(
+                    message=redacted_message,
+                    image_data=request.image,
+                    intent=intent,
+                    mode=mode,
+                    rag_task=rag_task
+                )
+                if cache_status == "miss":
+                    text, generated_telemetry, generated_citations = result
+                    response_cache.add(
+                        query_embedding,
+                        mode,
+                        (text, generated_telemetry.get("model_chosen", "model-router"), generated_citations)
+                    )
+                return result
+            
+            response_text, telemetry, citations = await coalescer.run(coalesce_key, generate)
         
         # Add disclaimers
         response_text = Guardrails.add_disclaimer(response_text, intent)
@@ -166,7 +352,8 @@ async def chat(request: ChatRequest):
             has_image=has_image,
             additional_context={
                 "intent_reason": intent_reason,
-                "safety_metadata": safety_metadata
+                "safety_metadata": safety_metadata,
+                "cache": cache_status
             }
         )
         
@@ -178,16 +365,188 @@ async def chat(request: ChatRequest):
         )
         
     except HTTPException:
+        if rag_task is not None:
+            rag_task.cancel()
         raise
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"ERROR: {str(e)}")
-        print(f"TRACEBACK: {error_details}")
-        observability.log_error("api_error", str(e), {"request": request.dict()})
+        if rag_task is not None:
+            rag_task.cancel()
+        logger.exception("api_error: %s", e)
+        # Exclude the base64 image, which can be hundreds of KB, from the log payload
+        observability.log_error(
+            "api_error",
+            str(e),
+            {
+                "request": request.model_dump(exclude={"image"}),
+                "has_image": request.image is not None
+            }
+        )
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+def _sse_event(data: Dict[str, Any], event: Optional[str] = None) -> bytes:
+    """Encode one server-sent event."""
+    prefix = f"event: {event}\n".encode() if event else b""
+    return prefix + b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming variant of /chat using server-sent events.
+    
+    Runs the same PHI redaction, guardrails and intent detection, then streams
+    `data: {"delta": ...}` events as Model Router produces tokens, followed by a
+    final `event: done` carrying telemetry (including ttfb_ms), citations and any
+    warning. Image requests are answered in a single delta, and the response
+    cache is not consulted.
+    """
+    original_message = request.message
+    mode = request.mode
+    has_image = request.image is not None
+    
+    redacted_message, has_phi, phi_types = PHIRedactor.redact_phi(original_message)
+    if has_phi:
+        observability.log_phi_detection(original_message, redacted_message, phi_types)
+    
+    (is_safe, warning_message, safety_metadata), (intent, intent_reason) = await asyncio.gather(
+        asyncio.to_thread(Guardrails.check_safety, redacted_message),
+        asyncio.to_thread(IntentDetector.detect_intent, redacted_message, has_image)
+    )
+    if not is_safe:
+        observability.log_error(
+            "safety_violation",
+            "Request blocked by guardrails",
+            {"risk_level": safety_metadata.get("risk_level"), "intent": intent}
+        )
+        raise HTTPException(status_code=400, detail=warning_message)
+    
+    # Build the prompt up front so retrieval errors are reported before streaming
+    documents = []
+    if not has_image:
+        if intent == "clinical":
+            if rag_pipeline.enabled:
+                documents = await rag_pipeline.retrieve_documents(redacted_message, top_k=3)
+                prompt = rag_pipeline.build_rag_prompt(redacted_message, documents)
+            else:
+                prompt = rag_pipeline._build_fallback_prompt(redacted_message)
+            max_tokens = 2000
+        else:
+            prompt = redacted_message
+            max_tokens = 800
+    
+    async def events():
+        try:
+            if has_image:
+                response_text, telemetry, citations = await generate_response(
+                    message=redacted_message,
+                    image_data=request.image,
+                    intent=intent,
+                    mode=mode
+                )
+                yield _sse_event({"delta": response_text})
+            else:
+                telemetry = {}
+                buffer = io.StringIO()
+                async for delta in foundry_client.stream_router(
+                    messages=[{"role": "user", "content": prompt}],
+                    telemetry=telemetry,
+                    mode=mode,
+                    max_tokens=max_tokens,
+                    temperature=0.7
+                ):
+                    buffer.write(delta)
+                    yield _sse_event({"delta": delta})
+                response_text = buffer.getvalue()
+                citations = (
+                    rag_pipeline.extract_citations(response_text, documents)
+                    if documents else None
+                )
+            
+            disclaimed = Guardrails.add_disclaimer(response_text, intent)
+            if len(disclaimed) > len(response_text):
+                yield _sse_event({"delta": disclaimed[len(response_text):]})
+            
+            full_telemetry = observability.log_routing_decision(
+                intent=intent,
+                mode=mode,
+                model_chosen=telemetry.get("model_chosen") or "model-router",
+                tokens=telemetry.get("tokens"),
+                latency_ms=telemetry.get("latency_ms", 0),
+                rationale=f"Model Router with {mode} mode optimization",
+                has_phi=has_phi,
+                has_image=has_image,
+                additional_context={
+                    "intent_reason": intent_reason,
+                    "safety_metadata": safety_metadata,
+                    "ttfb_ms": telemetry.get("ttfb_ms")
+                }
+            )
+            yield _sse_event(
+                {
+                    "telemetry": full_telemetry,
+                    "citations": citations,
+                    "warning": warning_message if warning_message else None
+                },
+                event="done"
+            )
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.exception("api_error: %s", e)
+            observability.log_error(
+                "api_error",
+                str(e),
+                {
+                    "request": request.model_dump(exclude={"image"}),
+                    "has_image": has_image
+                }
+            )
+            yield _sse_event({"detail": f"Internal server error: {str(e)}"}, event="error")
+    
+    # Content-Encoding is set so GZipMiddleware passes events through unbuffered
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "Content-Encoding": "identity"}
+    )
+
+
+async def generate_response(
+    message: str,
+    image_data: Optional[str],
+    intent: str,
+    mode: str,
+    rag_task: Optional[asyncio.Task] = None
+) -> tuple:
+    """Route a checked request to the vision, clinical, or general handler."""
+    citations = None
+    
+    if image_data:
+        # Vision path - Model Router detects image and routes to vision-capable model
+        response_text, telemetry = await handle_vision_request(
+            message=message,
+            image_data=image_data,
+            mode=mode
+        )
+    elif intent == "clinical":
+        # Clinical path with RAG - Model Router handles quality optimization
+        response_text, telemetry, citations = await handle_clinical_request(
+            message=message,
+            mode=mode,
+            rag_task=rag_task
+        )
+    else:
+        # Admin or general path - Model Router handles cost/balanced optimization
+        if rag_task is not None:
+            rag_task.cancel()
+        response_text, telemetry = await handle_general_request(
+            message=message,
+            mode=mode
+        )
+    
+    return response_text, telemetry, citations
+
+
 async def handle_vision_request(
     message: str,
     image_data: str,
@@ -195,21 +554,13 @@ async def handle_vision_request(
 ) -> tuple:
     """Handle vision model requests with image analysis using Model Router."""
     # Prepare vision prompt
-    vision_prompt = f"""Analyze this medical image and provide an educational description.
-
-User Question: {message}
-
-Please provide:
-1. A detailed description of what you observe
-2. Educational information about relevant anatomy or conditions
-3. Appropriate confidence levels and limitations
-4. Safety language emphasizing this is not a diagnostic tool
-
-Remember: This is for educational purposes only, not for diagnosis."""
+    vision_prompt = _VISION_PROMPT_TMPL.format(message=message)
     
     try:
+        # The frontend sends a data:image/...;base64 URL, which Model Router accepts
+        # as-is, so the image is passed through without decoding or re-encoding.
         # Model Router automatically detects image and routes to vision-capable model
-        response_text, telemetry = foundry_client.call_vision_model(
+        response_text, telemetry = await foundry_client.call_vision_model(
             message=vision_prompt,
             image_url=image_data,
             mode=mode
@@ -221,18 +572,22 @@ Remember: This is for educational purposes only, not for diagnosis."""
 
 async def handle_clinical_request(
     message: str,
-    mode: str
+    mode: str,
+    rag_task: Optional[asyncio.Task] = None
 ) -> tuple:
     """Handle clinical requests with RAG using Model Router."""
     citations = None
     
-    # Attempt RAG retrieval
+    # Attempt RAG retrieval, reusing the speculative search if one was started
     if rag_pipeline.enabled:
-        documents = rag_pipeline.retrieve_documents(message, top_k=3)
-        print(f"[DEBUG] Retrieved {len(documents)} documents from Azure AI Search")
+        if rag_task is not None:
+            documents = await rag_task
+        else:
+            documents = await rag_pipeline.retrieve_documents(message, top_k=3)
+        logger.debug("Retrieved %d documents from Azure AI Search", len(documents))
         augmented_prompt = rag_pipeline.build_rag_prompt(message, documents)
     else:
-        print("[DEBUG] RAG pipeline not enabled, using fallback prompt")
+        logger.debug("RAG pipeline not enabled, using fallback prompt")
         documents = []
         augmented_prompt = rag_pipeline._build_fallback_prompt(message)
     
@@ -240,19 +595,23 @@ async def handle_clinical_request(
     messages = [{"role": "user", "content": augmented_prompt}]
     
     try:
-        response_text, telemetry = foundry_client.call_router(
+        response_text, telemetry = await foundry_client.call_router(
             messages=messages,
             mode=mode,
             max_tokens=2000,  # Increased from 1000 to prevent truncation
             temperature=0.7
         )
         
-        print(f"[DEBUG] Response length: {len(response_text)} chars, {telemetry.get('tokens', {}).get('completion_tokens', 0)} tokens")
+        logger.debug(
+            "Response length: %d chars, %s tokens",
+            len(response_text),
+            telemetry.get("tokens", {}).get("completion_tokens", 0)
+        )
         
         # Extract citations if RAG was used
         if documents:
             citations = rag_pipeline.extract_citations(response_text, documents)
-            print(f"[DEBUG] Extracted {len(citations)} citations from response")
+            logger.debug("Extracted %d citations from response", len(citations))
         
         return response_text, telemetry, citations
         
@@ -269,7 +628,7 @@ async def handle_general_request(
     
     try:
         # Model Router handles cost/balanced optimization automatically
-        response_text, telemetry = foundry_client.call_router(
+        response_text, telemetry = await foundry_client.call_router(
             messages=messages,
             mode=mode,
             max_tokens=800,
@@ -283,5 +642,4 @@ async def handle_general_request(
 
 
 if __name__ == "__main__":
-    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
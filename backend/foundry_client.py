@@ -2,56 +2,491 @@
 Foundry Client Module
 Handles communication with Microsoft Foundry Model Router and Azure OpenAI deployments.
 """
+import asyncio
+import logging
 import os
 import time
-from typing import Dict, List, Optional, Any, Tuple
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Any, Tuple
 import httpx
-from openai import AzureOpenAI
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+import openai
+import orjson
+from openai import AsyncAzureOpenAI
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter
+)
+from azure.identity import DefaultAzureCredential
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+# Upstream statuses worth retrying: throttling and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Return whether an upstream error is transient (throttling, 5xx, connection)."""
+    if isinstance(error, (httpx.TransportError, openai.APIConnectionError)):
+        return True
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+class RetryAfterWait:
+    """Tenacity wait that honours Retry-After, else jittered exponential backoff."""
+    
+    def __init__(self, initial: float = 1.0, maximum: float = 30.0):
+        self.maximum = maximum
+        self.fallback = wait_exponential_jitter(initial=initial, max=maximum)
+    
+    def __call__(self, retry_state) -> float:
+        error = retry_state.outcome.exception()
+        response = getattr(error, "response", None)
+        retry_after = getattr(response, "headers", {}).get("Retry-After")
+        try:
+            return min(float(retry_after), self.maximum)
+        except (TypeError, ValueError):
+            return self.fallback(retry_state)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast for a cool-down period once most recent upstream calls failed.
+    
+    Tracks the outcome of the last `window` calls; when at least `min_calls` are
+    recorded and the failure rate exceeds `threshold`, the circuit opens for
+    `cooldown` seconds. The first call after the cool-down is let through.
+    """
+    
+    def __init__(
+        self,
+        window: int = 20,
+        threshold: float = 0.5,
+        cooldown: float = 30.0,
+        min_calls: int = 10
+    ):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.min_calls = min_calls
+        self._outcomes = deque(maxlen=window)
+        self._open_until = 0.0
+    
+    @property
+    def is_open(self) -> bool:
+        return time.monotonic() < self._open_until
+    
+    def record(self, success: bool):
+        """Record a call outcome and open the circuit if the failure rate is too high."""
+        self._outcomes.append(success)
+        if len(self._outcomes) < self.min_calls:
+            return
+        failure_rate = self._outcomes.count(False) / len(self._outcomes)
+        if failure_rate > self.threshold:
+            self._open_until = time.monotonic() + self.cooldown
+            self._outcomes.clear()
+
+
+class CachedTokenProvider:
+    """
+    Async Azure AD token provider that caches the bearer token in process.
+    
+    The token is refreshed `refresh_margin` seconds before it expires, and
+    concurrent callers share one refresh, so requests never wait on MSAL at the
+    expiry cliff. The synchronous credential runs in a worker thread.
+    """
+    
+    def __init__(self, credential, scope: str, refresh_margin: float = 300.0):
+        """
+        Initialize the provider.
+        
+        Args:
+            credential: Azure credential exposing get_token (e.g. DefaultAzureCredential)
+            scope: Token scope
+            refresh_margin: Seconds before expiry at which the token is refreshed
+        """
+        self.credential = credential
+        self.scope = scope
+        self.refresh_margin = refresh_margin
+        self._token: Optional[str] = None
+        self._expires_on = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _is_fresh(self) -> bool:
+        return self._token is not None and time.time() < self._expires_on - self.refresh_margin
+    
+    async def __call__(self) -> str:
+        """Return a valid bearer token, refreshing it if close to expiry."""
+        if self._is_fresh():
+            return self._token
+        async with self._lock:
+            # Another caller may have refreshed while we waited for the lock
+            if not self._is_fresh():
+                access_token = await asyncio.to_thread(self.credential.get_token, self.scope)
+                self._token = access_token.token
+                self._expires_on = access_token.expires_on
+        return self._token
+
+
+class RequestBatcher:
+    """
+    Groups calls that arrive within a short window and dispatches them together.
+    
+    Chat completions have no batched endpoint, so a batch is sent as concurrent
+    requests in one burst on the shared connection pool rather than trickled out.
+    """
+    
+    def __init__(self, window_ms: float, max_batch: int = 32):
+        """
+        Initialize the batcher.
+        
+        Args:
+            window_ms: How long to wait for more calls after the first one arrives
+            max_batch: Maximum number of calls dispatched together
+        """
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queues: Dict[Any, asyncio.Queue] = {}
+        self._consumers: Dict[Any, asyncio.Task] = {}
+        # Strong references so dispatched calls are not garbage collected mid-flight
+        self._dispatched = set()
+    
+    async def submit(self, key: Any, factory: Callable[[], Awaitable]) -> Any:
+        """
+        Queue factory() in the batch for key and wait for its own result.
+        
+        Args:
+            key: Batch key, e.g. (deployment, mode)
+            factory: Creates the coroutine to run when the batch is dispatched
+        
+        Returns:
+            The result of factory(); exceptions propagate to the caller
+        """
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = asyncio.Queue()
+            self._consumers[key] = asyncio.create_task(self._consume(queue))
+        future = asyncio.get_running_loop().create_future()
+        await queue.put((factory, future))
+        return await future
+    
+    async def _consume(self, queue: asyncio.Queue):
+        """Collect calls for one window, then dispatch them concurrently."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            for factory, future in batch:
+                task = asyncio.create_task(self._resolve(factory, future))
+                self._dispatched.add(task)
+                task.add_done_callback(self._dispatched.discard)
+    
+    @staticmethod
+    async def _resolve(factory: Callable[[], Awaitable], future: asyncio.Future):
+        """Run one call and hand its result or exception to the waiting caller."""
+        try:
+            result = await factory()
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+    
+    async def aclose(self):
+        """Stop the background consumers."""
+        for task in self._consumers.values():
+            task.cancel()
+        self._consumers.clear()
+        self._queues.clear()
+
+
+@dataclass(frozen=True, slots=True)
+class FoundryConfig:
+    """Foundry and Azure OpenAI settings, read from the environment once."""
+    foundry_endpoint: str
+    foundry_api_key: str
+    foundry_deployment: str
+    azure_endpoint: str
+    azure_api_key: str
+    azure_api_version: str
+    max_connections: int
+    max_keepalive: int
+    request_timeout: float
+    batch_window_ms: float
+    max_retries: int
+    breaker_cooldown: float
+    
+    @classmethod
+    def from_env(cls) -> "FoundryConfig":
+        """Build the configuration from environment variables."""
+        return cls(
+            # Foundry Model Router configuration
+            foundry_endpoint=os.getenv("FOUNDRY_ENDPOINT", ""),
+            foundry_api_key=os.getenv("FOUNDRY_API_KEY", ""),
+            foundry_deployment=os.getenv("FOUNDRY_DEPLOYMENT_NAME", "model-router"),
+            # Azure OpenAI configuration (fallback)
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT", ""),
+            azure_api_key=os.getenv("AZURE_OPENAI_API_KEY", ""),
+            azure_api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
+            max_connections=int(os.getenv("FOUNDRY_MAX_CONN", "64")),
+            max_keepalive=int(os.getenv("FOUNDRY_KEEPALIVE", "64")),
+            request_timeout=float(os.getenv("FOUNDRY_TIMEOUT", "120")),
+            batch_window_ms=float(os.getenv("FOUNDRY_BATCH_WINDOW_MS", "0")),
+            max_retries=int(os.getenv("FOUNDRY_MAX_RETRIES", "4")),
+            breaker_cooldown=float(os.getenv("FOUNDRY_BREAKER_COOLDOWN", "30"))
+        )
+
+
+# Loaded at import; app.py calls load_dotenv() before importing this module
+CONFIG = FoundryConfig.from_env()
 
 
 class FoundryClient:
     """Client for Microsoft Foundry Model Router and Azure OpenAI."""
     
-    def __init__(self):
-        """Initialize Foundry and Azure OpenAI clients."""
+    def __init__(self, config: Optional[FoundryConfig] = None):
+        """
+        Initialize Foundry and Azure OpenAI clients.
+        
+        Args:
+            config: Settings to use; defaults to the module-level CONFIG
+        """
+        config = config or CONFIG
+        self.config = config
+        
         # Foundry Model Router configuration
-        self.foundry_endpoint = os.getenv("FOUNDRY_ENDPOINT", "")
-        self.foundry_api_key = os.getenv("FOUNDRY_API_KEY", "")
-        self.foundry_deployment = os.getenv("FOUNDRY_DEPLOYMENT_NAME", "model-router")
+        self.foundry_endpoint = config.foundry_endpoint
+        self.foundry_api_key = config.foundry_api_key
+        self.foundry_deployment = config.foundry_deployment
         
         # Azure OpenAI configuration (fallback)
-        self.azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT", "")
-        self.azure_api_key = os.getenv("AZURE_OPENAI_API_KEY", "")
-        self.azure_api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+        self.azure_endpoint = config.azure_endpoint
+        self.azure_api_key = config.azure_api_key
+        self.azure_api_version = config.azure_api_version
+        
+        # Optional micro-batching of concurrent Model Router calls (off by default)
+        self.batcher = (
+            RequestBatcher(config.batch_window_ms) if config.batch_window_ms > 0 else None
+        )
+        
+        # Retry transient upstream failures, and stop calling a saturated upstream
+        self.max_attempts = config.max_retries + 1
+        self.breaker = CircuitBreaker(cooldown=config.breaker_cooldown)
+        
+        self._connect()
+    
+    def _connect(self):
+        """Create the pooled HTTP client and the Azure OpenAI client that uses it."""
+        config = self.config
+        
+        # One pooled HTTP/2 client shared by the SDK and the direct vision POST, so
+        # both use the same limits, timeouts and connections. Concurrent requests
+        # multiplex over a few kept-alive connections, so the pool can stay small.
+        # The SDK uses this client's timeout in place of its own 600s default.
+        limits = httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive,
+            keepalive_expiry=60.0
+        )
+        timeout = httpx.Timeout(config.request_timeout, connect=5.0)
+        self.http_client = httpx.AsyncClient(timeout=timeout, limits=limits, http2=True)
         
         # Initialize Azure OpenAI client
+        self.token_provider = None
         if self.azure_endpoint:
             # Use Azure AD authentication (DefaultAzureCredential)
             # Falls back to API key if credential fails
             try:
-                token_provider = get_bearer_token_provider(
+                token_provider = CachedTokenProvider(
                     DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
                 )
-                self.azure_client = AzureOpenAI(
+                self.token_provider = token_provider
+                self.azure_client = AsyncAzureOpenAI(
                     api_version=self.azure_api_version,
                     azure_endpoint=self.azure_endpoint,
-                    azure_ad_token_provider=token_provider
+                    azure_ad_token_provider=token_provider,
+                    http_client=self.http_client,
+                    max_retries=0  # retries are handled by _call_upstream
                 )
             except Exception:
                 # Fallback to API key if Azure AD fails
+                self.token_provider = None
                 if self.azure_api_key:
-                    self.azure_client = AzureOpenAI(
+                    self.azure_client = AsyncAzureOpenAI(
                         api_key=self.azure_api_key,
                         api_version=self.azure_api_version,
-                        azure_endpoint=self.azure_endpoint
+                        azure_endpoint=self.azure_endpoint,
+                        http_client=self.http_client,
+                        max_retries=0  # retries are handled by _call_upstream
                     )
                 else:
                     self.azure_client = None
         else:
             self.azure_client = None
     
-    def call_router(
+    async def _call_upstream(self, factory: Callable[[], Awaitable]) -> Any:
+        """
+        Run an upstream call with retries and the circuit breaker.
+        
+        Transient failures are retried with Retry-After or jittered exponential
+        backoff. Calls fail fast with CircuitOpenError while the breaker is open.
+        
+        Args:
+            factory: Creates the coroutine making one upstream attempt
+        
+        Returns:
+            The result of the first successful attempt
+        """
+        if self.breaker.is_open:
+            raise CircuitOpenError("Model Router is saturated; failing fast during cool-down")
+        
+        try:
+            async for attempt in AsyncRetrying(
+                retry=retry_if_exception(is_retryable),
+                wait=RetryAfterWait(initial=1.0, maximum=30.0),
+                stop=stop_after_attempt(self.max_attempts),
+                reraise=True
+            ):
+                with attempt:
+                    result = await factory()
+        except Exception as e:
+            if is_retryable(e):
+                self.breaker.record(False)
+            raise
+        
+        self.breaker.record(True)
+        return result
+    
+    def open(self):
+        """
+        Recreate the HTTP and Azure OpenAI clients if aclose() has closed them.
+        
+        Called at app startup, so a second lifespan (tests, uvicorn reload) does
+        not reuse a closed connection pool.
+        """
+        if self.http_client.is_closed:
+            self._connect()
+    
+    async def aclose(self):
+        """Close the shared HTTP client and its pooled connections."""
+        if self.batcher:
+            await self.batcher.aclose()
+        await self.http_client.aclose()
+    
+    async def prewarm(self):
+        """
+        Acquire the AAD token and open the HTTPS connection before the first request.
+        
+        Sends a one-token completion so TLS setup and token acquisition are not
+        paid by the first user. Failures are logged and ignored.
+        """
+        if not self.azure_client:
+            return
+        
+        try:
+            if self.token_provider:
+                await self.token_provider()
+            await self.azure_client.chat.completions.create(
+                model=self.foundry_deployment,
+                messages=[{"role": "user", "content": "ping"}],
+                max_tokens=1,
+                temperature=0.0
+            )
+        except Exception as e:
+            logger.warning("Model Router prewarm error: %s", e)
+    
+    @staticmethod
+    def _mode_parameters(mode: str, temperature: float, max_tokens: int) -> Tuple[float, int]:
+        """Return the (temperature, max_tokens) sent to Model Router for a routing mode."""
+        # Map mode to temperature/parameters that influence Model Router's decision
+        # Model Router automatically selects models based on request characteristics
+        if mode == "quality":
+            # Higher temperature for quality mode to allow more creative/detailed responses
+            return min(temperature + 0.2, 1.0), min(max_tokens + 500, 4000)
+        elif mode == "cost":
+            # Lower parameters for cost-optimized mode
+            return max(temperature - 0.2, 0.0), max(max_tokens - 200, 100)
+        else:  # balanced
+            return temperature, max_tokens
+    
+    @staticmethod
+    def _telemetry(
+        model_chosen: Optional[str],
+        prompt_tokens: int,
+        completion_tokens: int,
+        total_tokens: int,
+        latency_ms: float,
+        endpoint: str
+    ) -> Dict[str, Any]:
+        """Build the telemetry dict returned alongside a completion."""
+        return {
+            "model_chosen": model_chosen,
+            "tokens": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": total_tokens
+            },
+            "latency_ms": latency_ms,
+            "endpoint": endpoint
+        }
+    
+    async def _post_chat_completion(
+        self,
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        temperature: float
+    ) -> Dict[str, Any]:
+        """
+        POST a chat completion straight to the deployment, bypassing the SDK.
+        
+        Used for vision requests, where the SDK's request building and response
+        model parsing add overhead on multi-megabyte image payloads.
+        
+        Returns:
+            Decoded JSON response body
+        """
+        url = (
+            f"{self.azure_endpoint.rstrip('/')}/openai/deployments/"
+            f"{self.foundry_deployment}/chat/completions"
+        )
+        headers = {"Content-Type": "application/json"}
+        if self.token_provider:
+            token = await self.token_provider()
+            headers["Authorization"] = f"Bearer {token}"
+        else:
+            headers["api-key"] = self.azure_api_key
+        
+        response = await self.http_client.post(
+            url,
+            params={"api-version": self.azure_api_version},
+            headers=headers,
+            content=orjson.dumps({
+                "messages": messages,
+                "max_tokens": max_tokens,
+                "temperature": temperature
+            })
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
+    async def call_router(
         self,
         messages: List[Dict[str, Any]],
         mode: str = "balanced",
@@ -74,61 +509,122 @@ class FoundryClient:
         if not self.azure_client:
             raise ValueError("Azure OpenAI client not configured")
             
-        start_time = time.time()
+        start_time = time.perf_counter()
         
-        # Map mode to temperature/parameters that influence Model Router's decision
-        # Model Router automatically selects models based on request characteristics
-        if mode == "quality":
-            # Higher temperature for quality mode to allow more creative/detailed responses
-            adjusted_temperature = min(temperature + 0.2, 1.0)
-            adjusted_max_tokens = min(max_tokens + 500, 4000)
-        elif mode == "cost":
-            # Lower parameters for cost-optimized mode
-            adjusted_temperature = max(temperature - 0.2, 0.0)
-            adjusted_max_tokens = max(max_tokens - 200, 100)
-        else:  # balanced
-            adjusted_temperature = temperature
-            adjusted_max_tokens = max_tokens
+        adjusted_temperature, adjusted_max_tokens = self._mode_parameters(
+            mode, temperature, max_tokens
+        )
         
-        print(f"[DEBUG] Model Router request - Mode: {mode}, Temperature: {adjusted_temperature}, MaxTokens: {adjusted_max_tokens}")
+        logger.debug(
+            "Model Router request - Mode: %s, Temperature: %s, MaxTokens: %s",
+            mode, adjusted_temperature, adjusted_max_tokens
+        )
         
-        try:
-            # Call the model-router deployment using Azure OpenAI client
-            # Model Router automatically routes based on request characteristics
-            response = self.azure_client.chat.completions.create(
+        # Call the model-router deployment using Azure OpenAI client
+        # Model Router automatically routes based on request characteristics
+        def create():
+            return self.azure_client.chat.completions.create(
                 model=self.foundry_deployment,  # "model-router"
                 messages=messages,
                 max_tokens=adjusted_max_tokens,
                 temperature=adjusted_temperature
             )
-            
-            latency_ms = (time.time() - start_time) * 1000
-            
-            # Extract response and telemetry
-            response_text = response.choices[0].message.content
-            
-            # Extract usage and model info
-            usage = response.usage
-            model_chosen = response.model
-            
-            telemetry = {
-                "model_chosen": model_chosen,
-                "tokens": {
-                    "prompt_tokens": usage.prompt_tokens,
-                    "completion_tokens": usage.completion_tokens,
-                    "total_tokens": usage.total_tokens
-                },
-                "latency_ms": latency_ms,
-                "endpoint": "model_router"
-            }
-            
-            return response_text, telemetry
-            
+        
+        def send():
+            if self.batcher:
+                return self.batcher.submit((self.foundry_deployment, mode), create)
+            return create()
+        
+        try:
+            response = await self._call_upstream(send)
         except Exception as e:
-            latency_ms = (time.time() - start_time) * 1000
             raise Exception(f"Model Router call failed: {str(e)}") from e
+        
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        
+        # Extract response, usage and model info
+        response_text = response.choices[0].message.content
+        usage = response.usage
+        telemetry = self._telemetry(
+            response.model,
+            usage.prompt_tokens,
+            usage.completion_tokens,
+            usage.total_tokens,
+            latency_ms,
+            "model_router"
+        )
+        
+        return response_text, telemetry
     
-    def call_vision_model(
+    async def stream_router(
+        self,
+        messages: List[Dict[str, Any]],
+        telemetry: Dict[str, Any],
+        mode: str = "balanced",
+        max_tokens: int = 1000,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        """
+        Stream a Model Router completion, yielding content deltas as they arrive.
+        
+        Args:
+            messages: List of message dicts with role and content
+            telemetry: Dict filled in once the stream completes, with the same keys
+                as call_router's telemetry plus ttfb_ms (time to first token)
+            mode: Routing mode (balanced/cost/quality)
+            max_tokens: Maximum tokens for completion
+            temperature: Sampling temperature
+        
+        Yields:
+            Response text deltas
+        """
+        if not self.azure_client:
+            raise ValueError("Azure OpenAI client not configured")
+        
+        start_time = time.perf_counter()
+        adjusted_temperature, adjusted_max_tokens = self._mode_parameters(
+            mode, temperature, max_tokens
+        )
+        
+        # Only opening the stream is retried; a stream that fails midway surfaces
+        # to the caller, since deltas have already been yielded
+        stream = await self._call_upstream(
+            lambda: self.azure_client.chat.completions.create(
+                model=self.foundry_deployment,
+                messages=messages,
+                max_tokens=adjusted_max_tokens,
+                temperature=adjusted_temperature,
+                stream=True
+            )
+        )
+        
+        ttfb_ms = None
+        model_chosen = None
+        usage = None
+        async for chunk in stream:
+            model_chosen = chunk.model or model_chosen
+            usage = getattr(chunk, "usage", None) or usage
+            # Azure sends content-filter chunks with no choices
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if ttfb_ms is None:
+                    ttfb_ms = (time.perf_counter() - start_time) * 1000
+                yield delta
+        
+        # Usage is only reported on streams by newer API versions
+        telemetry.update(self._telemetry(
+            model_chosen,
+            getattr(usage, "prompt_tokens", 0),
+            getattr(usage, "completion_tokens", 0),
+            getattr(usage, "total_tokens", 0),
+            (time.perf_counter() - start_time) * 1000,
+            "model_router_stream"
+        ))
+        telemetry["ttfb_ms"] = ttfb_ms
+    
+    async def call_vision_model(
         self,
         message: str,
         image_url: str,
@@ -150,17 +646,19 @@ class FoundryClient:
         Returns:
             Tuple of (response_text, telemetry_dict)
         """
-        # Log image data for debugging
-        print(f"[DEBUG] Vision request - Image URL length: {len(image_url)}")
-        if image_url.startswith('data:'):
-            # Extract image format and preview base64 start
-            parts = image_url.split(',', 1)
-            if len(parts) == 2:
-                format_part = parts[0]
-                base64_data = parts[1]
-                print(f"[DEBUG] Image format: {format_part}")
-                print(f"[DEBUG] Base64 data length: {len(base64_data)}")
-                print(f"[DEBUG] Base64 preview (first 50 chars): {base64_data[:50]}")
+        # Log image data for debugging; skipped entirely unless DEBUG is enabled,
+        # since splitting copies the whole base64 payload
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Vision request - Image URL length: %d", len(image_url))
+            if image_url.startswith('data:'):
+                # Extract image format and preview base64 start
+                parts = image_url.split(',', 1)
+                if len(parts) == 2:
+                    format_part = parts[0]
+                    base64_data = parts[1]
+                    logger.debug("Image format: %s", format_part)
+                    logger.debug("Base64 data length: %d", len(base64_data))
+                    logger.debug("Base64 preview (first 50 chars): %s", base64_data[:50])
         
         # Format messages with image content
         messages = [
@@ -173,17 +671,49 @@ class FoundryClient:
             }
         ]
         
-        # Use Model Router for vision - it will route to appropriate vision-capable model
-        print(f"[DEBUG] Calling Model Router with vision content, mode={mode}")
-        response_text, telemetry = self.call_router(
-            messages=messages,
-            mode=mode,
-            max_tokens=max_tokens,
-            temperature=0.5
+        if not self.azure_client:
+            raise ValueError("Azure OpenAI client not configured")
+        
+        start_time = time.perf_counter()
+        adjusted_temperature, adjusted_max_tokens = self._mode_parameters(
+            mode, 0.5, max_tokens
         )
         
-        # Update telemetry to indicate vision request
-        telemetry["endpoint"] = "model_router_vision"
-        print(f"[DEBUG] Vision response received from model: {telemetry.get('model_chosen', 'unknown')}")
+        # Use Model Router for vision - it will route to appropriate vision-capable model
+        logger.debug("Calling Model Router with vision content, mode=%s", mode)
+        try:
+            response = await self._call_upstream(
+                lambda: self._post_chat_completion(
+                    messages,
+                    max_tokens=adjusted_max_tokens,
+                    temperature=adjusted_temperature
+                )
+            )
+        except Exception as e:
+            raise Exception(f"Model Router call failed: {str(e)}") from e
+        
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        usage = response.get("usage", {})
+        response_text = response["choices"][0]["message"]["content"]
+        telemetry = self._telemetry(
+            response.get("model"),
+            usage.get("prompt_tokens", 0),
+            usage.get("completion_tokens", 0),
+            usage.get("total_tokens", 0),
+            latency_ms,
+            "model_router_vision"
+        )
+        logger.debug("Vision response received from model: %s", telemetry.get("model_chosen", "unknown"))
         
         return response_text, telemetry
+
+
+_INSTANCE: Optional[FoundryClient] = None
+
+
+def get_client() -> FoundryClient:
+    """Return the process-wide FoundryClient, creating it on first use."""
+    global _INSTANCE
+    if _INSTANCE is None:
+        _INSTANCE = FoundryClient()
+    return _INSTANCE
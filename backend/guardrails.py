@@ -2,7 +2,14 @@
 Guardrails Module
 Implements safety checks and content moderation for healthcare context.
 """
-from typing import Dict, Tuple
+import re
+from typing import Dict, Optional, Tuple
+
+try:
+    import ahocorasick
+except ImportError:
+    # Optional accelerator; check_safety falls back to the keyword regexes without it
+    ahocorasick = None
 
 
 class Guardrails:
@@ -21,6 +28,40 @@ class Guardrails:
         "abuse medication", "sell prescription"
     ]
     
+    # One alternation per list, matched case-insensitively as plain substrings
+    # (no word boundaries, matching the previous `in` checks)
+    _PROHIBITED_RE = re.compile("|".join(map(re.escape, PROHIBITED_KEYWORDS)), re.IGNORECASE)
+    _HIGH_RISK_RE = re.compile("|".join(map(re.escape, HIGH_RISK_KEYWORDS)), re.IGNORECASE)
+    
+    # One automaton over both lists, so a message is scanned once and each hit
+    # reports its risk level
+    if ahocorasick is not None:
+        _AUTOMATON = ahocorasick.Automaton()
+        for _risk_level, _keywords in (("prohibited", PROHIBITED_KEYWORDS), ("high", HIGH_RISK_KEYWORDS)):
+            for _keyword in _keywords:
+                _AUTOMATON.add_word(_keyword, _risk_level)
+        _AUTOMATON.make_automaton()
+        del _risk_level, _keywords, _keyword
+    else:
+        _AUTOMATON = None
+    
+    @classmethod
+    def _keyword_risk(cls, message: str) -> Optional[str]:
+        """Return "prohibited" or "high" for the worst keyword in message, else None."""
+        if cls._AUTOMATON is None:
+            if cls._PROHIBITED_RE.search(message):
+                return "prohibited"
+            if cls._HIGH_RISK_RE.search(message):
+                return "high"
+            return None
+        
+        risk = None
+        for _, risk_level in cls._AUTOMATON.iter(message.lower()):
+            if risk_level == "prohibited":
+                return risk_level
+            risk = risk_level
+        return risk
+    
     @classmethod
     def check_safety(cls, message: str) -> Tuple[bool, str, Dict]:
         """
@@ -32,29 +73,27 @@ class Guardrails:
         Returns:
             Tuple of (is_safe, warning_message, metadata)
         """
-        message_lower = message.lower()
         metadata = {"risk_level": "low"}
+        risk = cls._keyword_risk(message)
         
         # Check for prohibited content
-        for keyword in cls.PROHIBITED_KEYWORDS:
-            if keyword in message_lower:
-                return False, "This request cannot be processed due to prohibited content.", {
-                    "risk_level": "prohibited",
-                    "reason": "prohibited_content"
-                }
+        if risk == "prohibited":
+            return False, "This request cannot be processed due to prohibited content.", {
+                "risk_level": "prohibited",
+                "reason": "prohibited_content"
+            }
         
         # Check for high-risk keywords
-        for keyword in cls.HIGH_RISK_KEYWORDS:
-            if keyword in message_lower:
-                emergency_message = (
-                    "⚠️ **Emergency Detected**: If this is a medical emergency, "
-                    "please call 911 or visit your nearest emergency room immediately. "
-                    "This is a demonstration tool and cannot provide emergency care."
-                )
-                return True, emergency_message, {
-                    "risk_level": "high",
-                    "requires_emergency_warning": True
-                }
+        if risk == "high":
+            emergency_message = (
+                "⚠️ **Emergency Detected**: If this is a medical emergency, "
+                "please call 911 or visit your nearest emergency room immediately. "
+                "This is a demonstration tool and cannot provide emergency care."
+            )
+            return True, emergency_message, {
+                "risk_level": "high",
+                "requires_emergency_warning": True
+            }
         
         return True, "", metadata
     
@@ -3,7 +3,13 @@ Intent Detection Module
 Classifies user messages into Admin, Clinical, or Vision intents.
 """
 import re
-from typing import Tuple
+from typing import Dict, Tuple
+
+try:
+    import ahocorasick
+except ImportError:
+    # Optional accelerator; detect_intent falls back to keyword regexes without it
+    ahocorasick = None
 
 
 class IntentDetector:
@@ -28,6 +34,53 @@ class IntentDetector:
         "look at this", "see this", "analyze", "examine"
     ]
     
+    _CATEGORIES = (
+        ("admin", ADMIN_KEYWORDS),
+        ("clinical", CLINICAL_KEYWORDS),
+        ("vision", VISION_KEYWORDS),
+    )
+    
+    # One automaton over every keyword, so a message is scanned once for all
+    # categories instead of once per keyword
+    if ahocorasick is not None:
+        _AUTOMATON = ahocorasick.Automaton()
+        for _category, _keywords in _CATEGORIES:
+            for _keyword in _keywords:
+                _AUTOMATON.add_word(_keyword, (_category, _keyword))
+        _AUTOMATON.make_automaton()
+        del _category, _keywords, _keyword
+    else:
+        _AUTOMATON = None
+    
+    # Fallback without the automaton: one case-insensitive alternation per
+    # category, matched as plain substrings like the automaton. The lookahead
+    # tries every position, so overlapping keywords ("reschedule" and
+    # "schedule") are each found; no keyword is a prefix of another in its
+    # category, so at most one can start at any position.
+    _KEYWORD_RES = {
+        category: re.compile(
+            "(?=(" + "|".join(map(re.escape, keywords)) + "))", re.IGNORECASE
+        )
+        for category, keywords in _CATEGORIES
+    }
+    
+    @classmethod
+    def _keyword_scores(cls, message: str) -> Dict[str, int]:
+        """Count the distinct keywords of each category present in the message."""
+        scores = {"admin": 0, "clinical": 0, "vision": 0}
+        if cls._AUTOMATON is not None:
+            # The automaton is case-sensitive, so it needs a lowercased copy
+            matched = {value for _, value in cls._AUTOMATON.iter(message.lower())}
+            for category, _ in matched:
+                scores[category] += 1
+            return scores
+        
+        # The fallback regexes ignore case, so only the matched keywords are lowercased
+        for category in scores:
+            found = {keyword.lower() for keyword in cls._KEYWORD_RES[category].findall(message)}
+            scores[category] = len(found)
+        return scores
+    
     @classmethod
     def detect_intent(cls, message: str, has_image: bool = False) -> Tuple[str, str]:
         """
@@ -40,22 +93,20 @@ class IntentDetector:
         Returns:
             Tuple of (intent, confidence_reason)
         """
-        message_lower = message.lower()
-        
         # Vision intent if image is present
         if has_image:
             return "vision", "Image attached - routed to vision model"
         
+        scores = cls._keyword_scores(message)
+        
         # Check for vision keywords
-        vision_score = sum(1 for keyword in cls.VISION_KEYWORDS if keyword in message_lower)
+        vision_score = scores["vision"]
         if vision_score > 0:
             return "vision", f"Vision keywords detected (score: {vision_score})"
         
-        # Check for clinical keywords
-        clinical_score = sum(1 for keyword in cls.CLINICAL_KEYWORDS if keyword in message_lower)
-        
-        # Check for admin keywords
-        admin_score = sum(1 for keyword in cls.ADMIN_KEYWORDS if keyword in message_lower)
+        # Check for clinical and admin keywords
+        clinical_score = scores["clinical"]
+        admin_score = scores["admin"]
         
         # Classify based on highest score
         if clinical_score > admin_score:
@@ -5,6 +5,17 @@ Detects and redacts Protected Health Information (PHI) from user messages.
 import re
 from typing import Tuple, List
 
+try:
+    import hyperscan
+except ImportError:
+    # Optional accelerator; redact_phi runs the regex over every message without it
+    hyperscan = None
+
+
+def _stop_scan(expression_id, start, end, flags, context) -> bool:
+    """Hyperscan match handler that ends the scan on the first match."""
+    return True
+
 
 class PHIRedactor:
     """Detects and redacts PHI from text."""
@@ -19,11 +30,72 @@ class PHIRedactor:
         "address": r'\b\d+\s+[\w\s]+(?:street|st|avenue|ave|road|rd|lane|ln|drive|dr|boulevard|blvd)\b',
     }
     
-    # Common name patterns (simplified - in production use NER)
-    NAME_PATTERNS = [
-        r'\b(?:my name is|I am|I\'m)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\b',
-        r'\bpatient:\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\b',
-    ]
+    # Common name patterns (simplified - in production use NER), merged into
+    # one alternation; the name is the name_value group
+    NAME_PATTERN = (
+        r'\b(?:(?:my name is|I am|I\'m)\s+|patient:\s*)'
+        r'(?P<name_value>[A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\b'
+    )
+    
+    # All non-name PHI patterns fused into one alternation, so the text is
+    # scanned once; the named group that matched identifies the PHI type
+    _COMBINED_PATTERN = re.compile(
+        "|".join(f"(?P<{phi_type}>{pattern})" for phi_type, pattern in PATTERNS.items()),
+        re.IGNORECASE
+    )
+    _TOKENS = {phi_type: f"[REDACTED_{phi_type.upper()}]" for phi_type in PATTERNS}
+    
+    # Every pattern above needs a digit or an '@', so text without either can
+    # skip the combined scan and only run the name pattern
+    _DIGIT_OR_AT = re.compile(r"[\d@]")
+    
+    # Names are matched in a separate pass over the already-redacted text. Run
+    # case-insensitively alongside the other patterns, the name alternative
+    # would claim a following "MRN"/"DOB" keyword as a surname and leave the
+    # value after it unredacted.
+    _COMPILED_NAME_PATTERN = re.compile(NAME_PATTERN, re.IGNORECASE)
+    
+    # Hyperscan prefilter over every pattern: one SIMD pass that tells whether
+    # anything could match, so PHI-free text never reaches the backtracking
+    # regex. HS_FLAG_PREFILTER lets Hyperscan match a superset of constructs
+    # it cannot run exactly, which is safe for a filter.
+    if hyperscan is not None:
+        _PREFILTER = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+        _PREFILTER.compile(
+            expressions=[p.encode() for p in (*PATTERNS.values(), NAME_PATTERN)],
+            flags=(
+                hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH
+                | hyperscan.HS_FLAG_PREFILTER | hyperscan.HS_FLAG_UTF8
+                | hyperscan.HS_FLAG_UCP
+            )
+        )
+    else:
+        _PREFILTER = None
+    
+    @classmethod
+    def _may_contain_phi(cls, text: str) -> bool:
+        """Return False only when the prefilter rules out every PHI pattern."""
+        if cls._PREFILTER is None:
+            return True
+        try:
+            data = text.encode("utf-8")
+        except UnicodeEncodeError:
+            # Lone surrogates are not valid UTF-8 input for Hyperscan
+            return True
+        try:
+            cls._PREFILTER.scan(data, match_event_handler=_stop_scan)
+        except hyperscan.ScanTerminated:
+            # The handler stops the scan at the first possible match
+            return True
+        except hyperscan.ScratchInUseError:
+            # Another thread holds the shared scratch space; use the regex
+            return True
+        return False
+    
+    @staticmethod
+    def _redact_name(match: re.Match) -> str:
+        """Replace the captured name while keeping the introducing phrase."""
+        return match.group(0).replace(match.group("name_value"), "[REDACTED_NAME]")
     
     @classmethod
     def redact_phi(cls, text: str) -> Tuple[str, bool, List[str]]:
@@ -36,32 +108,27 @@ class PHIRedactor:
         Returns:
             Tuple of (redacted_text, has_phi, phi_types_detected)
         """
+        if not cls._may_contain_phi(text):
+            return text, False, []
+        
         redacted_text = text
         phi_types_detected = []
         
-        # Redact each PHI pattern
-        for phi_type, pattern in cls.PATTERNS.items():
-            matches = re.findall(pattern, redacted_text, re.IGNORECASE)
-            if matches:
-                phi_types_detected.append(phi_type)
-                redacted_text = re.sub(
-                    pattern,
-                    f"[REDACTED_{phi_type.upper()}]",
-                    redacted_text,
-                    flags=re.IGNORECASE
-                )
+        # Redact all non-name PHI in one pass, recording which types matched
+        matched_types = set()
+        
+        def replace(match):
+            matched_types.add(match.lastgroup)
+            return cls._TOKENS[match.lastgroup]
+        
+        if cls._DIGIT_OR_AT.search(redacted_text):
+            redacted_text = cls._COMBINED_PATTERN.sub(replace, redacted_text)
+            phi_types_detected.extend(t for t in cls.PATTERNS if t in matched_types)
         
         # Redact names
-        for name_pattern in cls.NAME_PATTERNS:
-            matches = re.findall(name_pattern, redacted_text, re.IGNORECASE)
-            if matches:
-                phi_types_detected.append("name")
-                redacted_text = re.sub(
-                    name_pattern,
-                    lambda m: m.group(0).replace(m.group(1), "[REDACTED_NAME]"),
-                    redacted_text,
-                    flags=re.IGNORECASE
-                )
+        redacted_text, count = cls._COMPILED_NAME_PATTERN.subn(cls._redact_name, redacted_text)
+        if count:
+            phi_types_detected.append("name")
         
         has_phi = len(phi_types_detected) > 0
         
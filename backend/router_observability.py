@@ -2,23 +2,196 @@
 Router Observability Module
 Tracks and logs model routing decisions, telemetry, and performance metrics.
 """
+import atexit
 import logging
-import json
+import os
+import logging.handlers
+import queue
+import socket
+import sys
 from datetime import datetime
 from typing import Dict, Any, Optional
 from pathlib import Path
 
-# Configure logging
+import orjson
+
+
+class _BufferedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Size-rotated file handler that buffers writes in a 64 KB file buffer.
+    
+    The stock handler flushes and re-checks the file size on every record; this
+    one writes without flushing and only checks for rollover every
+    check_interval records, so the file may overshoot maxBytes slightly.
+    """
+    
+    def __init__(self, path: Path, max_bytes: int, backup_count: int,
+                 buffer_size: int = 65536, check_interval: int = 128):
+        self.buffer_size = buffer_size
+        self.check_interval = check_interval
+        self._emits_since_check = 0
+        super().__init__(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.buffer_size,
+                    encoding=self.encoding, errors=self.errors)
+    
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        self._emits_since_check += 1
+        if self._emits_since_check < self.check_interval:
+            return False
+        self._emits_since_check = 0
+        return super().shouldRollover(record)
+    
+    def emit(self, record: logging.LogRecord):
+        # StreamHandler.emit flushes after every record; leave that to flush()
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class _FlushingMemoryHandler(logging.handlers.MemoryHandler):
+    """MemoryHandler that also flushes its target's buffer when it flushes."""
+    
+    def flush(self):
+        self.acquire()
+        try:
+            super().flush()
+            if self.target:
+                self.target.flush()
+        finally:
+            self.release()
+
+
+class _FlushOnIdleQueueListener(logging.handlers.QueueListener):
+    """QueueListener that flushes its handlers whenever the queue drains."""
+    
+    def dequeue(self, block: bool):
+        try:
+            return self.queue.get(block=False)
+        except queue.Empty:
+            # Nothing more to batch, so write out what is buffered before waiting
+            for handler in self.handlers:
+                handler.flush()
+            return self.queue.get(block)
+
+
+# Configure logging: request handlers only enqueue records, and a background
+# listener thread does the file and console I/O
 log_file = Path(__file__).parent / "router.log"
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
-)
+
+
+def _file_sink() -> logging.Handler:
+    """
+    Build the router.log sink.
+    
+    router.log is newline-delimited JSON, one event object per line. Records
+    are batched in memory and a buffered file, and written out when 1000
+    records accumulate, on any warning (including PHI detections) or error, or
+    when the queue goes idle. The file rotates at ROUTER_LOG_MAX_BYTES, keeping
+    ROUTER_LOG_BACKUPS old files.
+    """
+    file_handler = _BufferedRotatingFileHandler(
+        log_file,
+        max_bytes=int(os.getenv("ROUTER_LOG_MAX_BYTES", str(64 * 1024 * 1024))),
+        backup_count=int(os.getenv("ROUTER_LOG_BACKUPS", "5"))
+    )
+    file_handler.setFormatter(logging.Formatter('%(message)s'))
+    return _FlushingMemoryHandler(
+        capacity=1000,
+        flushLevel=logging.WARNING,
+        target=file_handler,
+        flushOnClose=True
+    )
+
+
+def _syslog_sink() -> Optional[logging.Handler]:
+    """
+    Build the syslog sink: one datagram per event to ROUTER_SYSLOG_ADDRESS.
+    
+    The address is a socket path (default /dev/log) or host:port for UDP.
+    Returns None if the socket cannot be opened, e.g. in containers or on
+    macOS where /dev/log does not exist.
+    """
+    address = os.getenv("ROUTER_SYSLOG_ADDRESS", "/dev/log")
+    if ":" in address:
+        host, port = address.rsplit(":", 1)
+        address = (host, int(port))
+    try:
+        handler = logging.handlers.SysLogHandler(address=address, socktype=socket.SOCK_DGRAM)
+        # Unix-socket connection errors are swallowed by the constructor on
+        # newer Pythons (and raised on older ones), leaving a closed socket
+        if handler.socket is None or handler.socket.fileno() == -1:
+            handler.close()
+            raise OSError(f"cannot connect to {address}")
+    except OSError as e:
+        logging.getLogger(__name__).warning(
+            "Syslog sink %s unavailable (%s); writing router.log instead", address, e
+        )
+        return None
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    return handler
+
+
+# ROUTER_LOG_SINK=syslog sends events to syslog instead of router.log, keeping
+# disk off the request path; the file sink is the default and the fallback
+_sink_handler = None
+if os.getenv("ROUTER_LOG_SINK", "file").lower() == "syslog":
+    _sink_handler = _syslog_sink()
+if _sink_handler is None:
+    _sink_handler = _file_sink()
+_handlers = [_sink_handler]
+
+# Echoing every event to stderr doubles the write path, so the console copy is
+# opt-in for development
+if os.getenv("ROUTER_LOG_STDERR") == "1":
+    _console_handler = logging.StreamHandler()
+    _console_handler.setFormatter(
+        logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    )
+    _handlers.append(_console_handler)
+
+_log_queue = queue.SimpleQueue()
+_listener = _FlushOnIdleQueueListener(_log_queue, *_handlers, respect_handler_level=True)
+_listener.start()
+atexit.register(_listener.stop)
+
 logger = logging.getLogger(__name__)
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+
+# Known categorical values, interned so telemetry dicts share one copy of each.
+# mode comes from the request body, so only known values are interned rather
+# than arbitrary client input.
+_CATEGORIES = {
+    value: sys.intern(value)
+    for value in ("admin", "clinical", "vision", "balanced", "cost", "quality")
+}
+
+
+def _dumps(obj: Any) -> str:
+    """Serialize a log payload to compact JSON; datetimes are encoded as UTC ISO-8601."""
+    return orjson.dumps(obj, option=orjson.OPT_UTC_Z | orjson.OPT_NAIVE_UTC).decode()
+
+
+def _log_event(level: int, event: str, payload: Dict[str, Any]):
+    """
+    Log one event as a single JSON object with event and level fields.
+    
+    Callers check logger.isEnabledFor(level) first, before building payload.
+    """
+    logger.log(level, "%s", _dumps({
+        "event": event,
+        "level": logging.getLevelName(level),
+        **payload
+    }))
 
 
 class RouterObservability:
@@ -54,9 +227,9 @@ class RouterObservability:
             Telemetry dict for API response
         """
         telemetry = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "intent": intent,
-            "routing_mode": mode,
+            "timestamp": datetime.utcnow(),
+            "intent": _CATEGORIES.get(intent, intent),
+            "routing_mode": _CATEGORIES.get(mode, mode),
             "model_chosen": model_chosen,
             "tokens": tokens or {},
             "latency_ms": round(latency_ms, 2),
@@ -68,8 +241,10 @@ class RouterObservability:
         if additional_context:
             telemetry["additional_context"] = additional_context
         
-        # Log to file and console
-        logger.info(f"ROUTING_DECISION: {json.dumps(telemetry, indent=2)}")
+        # Log to file and console; the telemetry is returned for the API
+        # response even when routing events are not logged
+        if logger.isEnabledFor(logging.INFO):
+            _log_event(logging.INFO, "routing_decision", telemetry)
         
         return telemetry
     
@@ -80,13 +255,15 @@ class RouterObservability:
         context: Optional[Dict[str, Any]] = None
     ):
         """Log an error with context."""
+        if not logger.isEnabledFor(logging.ERROR):
+            return
         error_data = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.utcnow(),
             "error_type": error_type,
             "error_message": error_message,
             "context": context or {}
         }
-        logger.error(f"ERROR: {json.dumps(error_data, indent=2)}")
+        _log_event(logging.ERROR, "error", error_data)
     
     @staticmethod
     def log_phi_detection(
@@ -95,11 +272,13 @@ class RouterObservability:
         phi_types_detected: list
     ):
         """Log PHI detection and redaction."""
+        if not logger.isEnabledFor(logging.WARNING):
+            return
         phi_log = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.utcnow(),
             "phi_types_detected": phi_types_detected,
             "redaction_applied": True,
             "original_length": len(original_message),
             "redacted_length": len(redacted_message)
         }
-        logger.warning(f"PHI_DETECTED: {json.dumps(phi_log, indent=2)}")
+        _log_event(logging.WARNING, "phi_detected", phi_log)
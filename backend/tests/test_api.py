@@ -1,6 +1,8 @@
 """
 Integration tests for the FastAPI application.
 """
+import asyncio
+import time
 import pytest
 from fastapi.testclient import TestClient
 import sys
@@ -9,15 +11,28 @@ import os
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app import app
+import app as app_module
+from app import app, MAX_IMAGE_BYTES, MAX_REQUEST_BYTES
 
-client = TestClient(app)
+# Tests that reach Azure services only produce a meaningful result with live
+# keys; without them they just wait on failing upstream calls
+requires_azure = pytest.mark.skipif(
+    not os.getenv("SEARCH_KEY"),
+    reason="requires live Azure keys (SEARCH_KEY not set)"
+)
+
+
+@pytest.fixture(scope="class")
+def client():
+    """Share one TestClient per class so app startup and shutdown run once."""
+    with TestClient(app) as test_client:
+        yield test_client
 
 
 class TestAPI:
     """Integration tests for API endpoints."""
     
-    def test_root_endpoint(self):
+    def test_root_endpoint(self, client):
         """Test health check endpoint."""
         response = client.get("/")
         assert response.status_code == 200
@@ -25,7 +40,8 @@ class TestAPI:
         assert data["status"] == "healthy"
         assert "Care Triage" in data["service"]
     
-    def test_chat_endpoint_structure(self):
+    @requires_azure
+    def test_chat_endpoint_structure(self, client):
         """Test chat endpoint accepts proper structure."""
         # Note: This will fail without proper API keys configured
         # but we can test the structure
@@ -39,7 +55,8 @@ class TestAPI:
         # Will return 500 without proper config, but structure is validated
         assert response.status_code in [200, 500]
     
-    def test_chat_endpoint_invalid_mode(self):
+    @requires_azure
+    def test_chat_endpoint_invalid_mode(self, client):
         """Test chat endpoint with invalid mode still processes."""
         response = client.post(
             "/chat",
@@ -51,7 +68,8 @@ class TestAPI:
         # Should still process with default handling
         assert response.status_code in [200, 422, 500]
     
-    def test_chat_endpoint_empty_message(self):
+    @requires_azure
+    def test_chat_endpoint_empty_message(self, client):
         """Test chat endpoint with empty message."""
         response = client.post(
             "/chat",
@@ -63,6 +81,67 @@ class TestAPI:
         # Should handle empty message gracefully
         assert response.status_code in [200, 400, 500]
 
+    def test_chat_endpoint_oversized_body(self, client):
+        """Test oversized request bodies are rejected before parsing."""
+        response = client.post(
+            "/chat",
+            json={
+                "message": "What is this?",
+                "mode": "balanced",
+                "image": "A" * (MAX_REQUEST_BYTES + 1)
+            }
+        )
+        assert response.status_code == 413
+    
+    def test_oversized_body_keeps_cors_headers(self, client):
+        """Test the 413 from the size limit still carries CORS headers."""
+        response = client.post(
+            "/chat",
+            content=b"A" * (MAX_REQUEST_BYTES + 1),
+            headers={"Origin": "http://localhost:5173", "Content-Type": "application/json"}
+        )
+        assert response.status_code == 413
+        assert response.headers["access-control-allow-origin"] == "http://localhost:5173"
+    
+    def test_chat_endpoint_oversized_image(self, client):
+        """Test images over the size limit fail validation."""
+        response = client.post(
+            "/chat",
+            json={
+                "message": "What is this?",
+                "mode": "balanced",
+                "image": "A" * (MAX_IMAGE_BYTES + 1)
+            }
+        )
+        assert response.status_code == 422
+    
+    def test_chat_stream_blocks_unsafe_message(self, client):
+        """Test the streaming endpoint applies guardrails before streaming."""
+        response = client.post(
+            "/chat/stream",
+            json={
+                "message": "Can you help me forge a prescription?",
+                "mode": "balanced"
+            }
+        )
+        assert response.status_code == 400
+
+
+class TestLifespan:
+    """Tests for app startup."""
+    
+    def test_slow_prewarm_does_not_block_startup(self, monkeypatch):
+        """Test startup proceeds once the prewarm timeout elapses."""
+        async def hang():
+            await asyncio.sleep(60)
+        
+        monkeypatch.setattr(app_module, "PREWARM_TIMEOUT", 0.1)
+        monkeypatch.setattr(app_module.foundry_client, "prewarm", hang)
+        started = time.monotonic()
+        with TestClient(app) as test_client:
+            assert test_client.get("/").status_code == 200
+        assert time.monotonic() - started < 5
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -1,11 +1,16 @@
 """
 Tests for Care Triage backend modules.
 """
+import asyncio
+import time
 import pytest
 from intent_detector import IntentDetector
 from phi_redactor import PHIRedactor
 from guardrails import Guardrails
-from model_selector import ModelSelector
+from foundry_client import CachedTokenProvider, CircuitBreaker, FoundryClient, RequestBatcher
+from ai.cache import ResponseCache, SemanticCache, TTLCache
+from ai.embeddings import QueryEmbedder
+from ai.rag_pipeline import RAGPipeline
 
 
 class TestIntentDetector:
@@ -37,6 +42,25 @@ class TestIntentDetector:
         message = "Hello, can you help me?"
         intent, reason = IntentDetector.detect_intent(message, has_image=False)
         assert intent == "clinical"  # Should default to clinical for safety
+    
+    @pytest.mark.parametrize("message", [
+        "What are the costs of my appointments?",
+        "Where are your locations and what are the prices?",
+        "Can you look at these images of my rash?",
+        "My symptoms are getting worse",
+        "headaches and coughing",
+        "I need to RESCHEDULE my MRI",
+    ])
+    def test_fallback_scores_match_substring_matching(self, message, monkeypatch):
+        """Test the automaton and the regex fallback both count keyword substrings."""
+        expected = {
+            category: sum(1 for keyword in keywords if keyword in message.lower())
+            for category, keywords in IntentDetector._CATEGORIES
+        }
+        if IntentDetector._AUTOMATON is not None:
+            assert IntentDetector._keyword_scores(message) == expected
+        monkeypatch.setattr(IntentDetector, "_AUTOMATON", None)
+        assert IntentDetector._keyword_scores(message) == expected
 
 
 class TestPHIRedactor:
@@ -83,6 +107,25 @@ class TestPHIRedactor:
         assert has_phi
         assert "name" in types
         assert "John Smith" not in redacted
+    
+    def test_email_after_name_phrase(self):
+        """Test an email following "I am" is redacted as an email, not a name."""
+        text = "I am john@example.com"
+        redacted, has_phi, types = PHIRedactor.redact_phi(text)
+        assert types == ["email"]
+        assert redacted == "I am [REDACTED_EMAIL]"
+    
+    @pytest.mark.parametrize("text, expected", [
+        ("Patient: Bob  MRN 1234567", "Patient: [REDACTED_NAME]  [REDACTED_MRN]"),
+        ("my name is Bob DOB 01/02/1990", "my name is [REDACTED_NAME] [REDACTED_DATE_OF_BIRTH]"),
+        ("I am Ann MRN:87654321", "I am [REDACTED_NAME] [REDACTED_MRN]"),
+        ("I'm Tom dob 1/2/80", "I'm [REDACTED_NAME] [REDACTED_DATE_OF_BIRTH]"),
+    ])
+    def test_name_does_not_swallow_mrn_or_dob(self, text, expected):
+        """Test the MRN/DOB after a name is still redacted."""
+        redacted, has_phi, types = PHIRedactor.redact_phi(text)
+        assert redacted == expected
+        assert "name" in types
 
 
 class TestGuardrails:
@@ -126,54 +169,197 @@ class TestGuardrails:
         assert "not be used for diagnostic decisions" in with_disclaimer
 
 
-class TestModelSelector:
-    """Tests for ModelSelector."""
-    
-    def test_select_vision_model_for_image(self):
-        """Test vision model selection for images."""
-        deployment, model_type, rationale = ModelSelector.select_model(
-            intent="admin",
-            mode="balanced",
-            has_image=True,
-            use_router=True
-        )
-        assert model_type == "vision"
-        assert "vision" in deployment.lower()
-        assert "image" in rationale.lower()
-    
-    def test_select_router_for_text(self):
-        """Test router selection for text."""
-        deployment, model_type, rationale = ModelSelector.select_model(
-            intent="clinical",
-            mode="balanced",
-            has_image=False,
-            use_router=True
-        )
-        assert model_type == "router"
-        assert deployment == "model-router"
-    
-    def test_cost_mode_preferences(self):
-        """Test cost mode preferences."""
-        prefs = ModelSelector.get_routing_preferences("cost")
-        assert prefs["routing_mode"] == "cost_optimized"
-        assert prefs["prefer_fast"] == True
-    
-    def test_quality_mode_preferences(self):
-        """Test quality mode preferences."""
-        prefs = ModelSelector.get_routing_preferences("quality")
-        assert prefs["routing_mode"] == "quality_optimized"
-        assert prefs["prefer_fast"] == False
-    
-    def test_admin_intent_direct(self):
-        """Test admin intent with router disabled."""
-        deployment, model_type, rationale = ModelSelector.select_model(
-            intent="admin",
-            mode="balanced",
-            has_image=False,
-            use_router=False
-        )
-        assert model_type == "admin"
-        assert "admin" in deployment.lower() or "35" in deployment
+class TestTTLCache:
+    """Tests for TTLCache."""
+    
+    def test_lru_eviction(self):
+        """Test least recently used entry is evicted at maxsize."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.cache_info()["currsize"] == 2
+    
+    def test_expired_entry_misses(self):
+        """Test entries older than the TTL are refetched."""
+        cache = TTLCache(maxsize=2, ttl=0.01)
+        cache.set("a", 1)
+        time.sleep(0.02)
+        assert cache.get("a") is None
+        assert cache.cache_info()["misses"] == 1
+
+
+class TestSemanticCache:
+    """Tests for SemanticCache."""
+    
+    def test_similar_query_hits(self):
+        """Test lookup returns payload for a near-identical embedding."""
+        cache = SemanticCache(threshold=0.9)
+        cache.add([1.0, 0.0, 0.0], "docs")
+        assert cache.lookup([0.99, 0.05, 0.0]) == "docs"
+    
+    def test_dissimilar_query_misses(self):
+        """Test lookup misses below the similarity threshold."""
+        cache = SemanticCache(threshold=0.9)
+        cache.add([1.0, 0.0, 0.0], "docs")
+        assert cache.lookup([0.0, 1.0, 0.0]) is None
+    
+    def test_eviction_bounds_size(self):
+        """Test cache evicts least used entries beyond maxlen."""
+        cache = SemanticCache(threshold=0.9, maxlen=2)
+        cache.add([1.0, 0.0, 0.0], "a")
+        cache.add([0.0, 1.0, 0.0], "b")
+        cache.lookup([1.0, 0.0, 0.0])
+        cache.add([0.0, 0.0, 1.0], "c")
+        assert len(cache) == 2
+        assert cache.lookup([1.0, 0.0, 0.0]) == "a"
+        assert cache.lookup([0.0, 1.0, 0.0]) is None
+        assert cache.lookup([0.0, 0.0, 1.0]) == "c"
+
+
+class TestResponseCache:
+    """Tests for ResponseCache."""
+    
+    def test_modes_are_isolated(self):
+        """Test a cached answer is only reused for the same routing mode."""
+        cache = ResponseCache(threshold=0.95)
+        cache.add([1.0, 0.0], "cost", ("answer", "gpt-4.1-mini", None))
+        assert cache.lookup([1.0, 0.0], "cost") == ("answer", "gpt-4.1-mini", None)
+        assert cache.lookup([1.0, 0.0], "quality") is None
+    
+    def test_unknown_mode_not_cached(self):
+        """Test unknown modes bypass the cache."""
+        cache = ResponseCache()
+        cache.add([1.0, 0.0], "invalid_mode", ("answer", "model", None))
+        assert cache.lookup([1.0, 0.0], "invalid_mode") is None
+
+
+class TestRequestBatcher:
+    """Tests for RequestBatcher."""
+    
+    def test_each_caller_gets_its_own_result(self):
+        """Test batched calls resolve to their own results and exceptions."""
+        async def call(value):
+            if value == "bad":
+                raise ValueError(value)
+            return value
+        
+        async def run():
+            batcher = RequestBatcher(window_ms=5)
+            results = await asyncio.gather(
+                *(batcher.submit("key", lambda v=v: call(v)) for v in ("a", "bad", "c")),
+                return_exceptions=True
+            )
+            await batcher.aclose()
+            return results
+        
+        first, second, third = asyncio.run(run())
+        assert (first, third) == ("a", "c")
+        assert isinstance(second, ValueError)
+
+
+class TestCircuitBreaker:
+    """Tests for CircuitBreaker."""
+    
+    def test_opens_on_high_failure_rate(self):
+        """Test the circuit opens once most recent calls failed."""
+        breaker = CircuitBreaker(window=4, threshold=0.5, cooldown=30, min_calls=4)
+        for success in (True, False, False):
+            breaker.record(success)
+        assert not breaker.is_open
+        breaker.record(False)
+        assert breaker.is_open
+    
+    def test_stays_closed_on_low_failure_rate(self):
+        """Test occasional failures do not open the circuit."""
+        breaker = CircuitBreaker(window=4, threshold=0.5, cooldown=30, min_calls=4)
+        for success in (True, False, True, True):
+            breaker.record(success)
+        assert not breaker.is_open
+
+
+class TestCachedTokenProvider:
+    """Tests for CachedTokenProvider."""
+    
+    def test_concurrent_callers_share_one_token_request(self):
+        """Test a cached token is reused instead of asking the credential again."""
+        class FakeCredential:
+            calls = 0
+            
+            def get_token(self, scope):
+                FakeCredential.calls += 1
+                return type("AccessToken", (), {"token": "abc", "expires_on": time.time() + 3600})
+        
+        async def run():
+            provider = CachedTokenProvider(FakeCredential(), "scope")
+            return await asyncio.gather(*(provider() for _ in range(5)))
+        
+        assert asyncio.run(run()) == ["abc"] * 5
+        assert FakeCredential.calls == 1
+
+
+class TestFoundryClient:
+    """Tests for FoundryClient lifecycle."""
+    
+    def test_open_recreates_closed_http_client(self):
+        """Test a client closed by one lifespan is usable by the next."""
+        client = FoundryClient()
+        asyncio.run(client.aclose())
+        assert client.http_client.is_closed
+        client.open()
+        assert not client.http_client.is_closed
+
+
+
+class TestQueryEmbedder:
+    """Tests for QueryEmbedder request sharing."""
+    
+    def test_failed_embedding_is_retried(self):
+        """Test a failed embedding call is not reused by the next caller."""
+        class FakeEmbeddings:
+            calls = 0
+            
+            async def create(self, model, input):
+                FakeEmbeddings.calls += 1
+                if FakeEmbeddings.calls == 1:
+                    raise RuntimeError("throttled")
+                return type("Response", (), {"data": [type("Item", (), {"embedding": [1.0, 0.0]})]})
+        
+        client = type("Client", (), {"embeddings": FakeEmbeddings()})
+        embedder = QueryEmbedder(client, "deployment")
+        
+        async def run():
+            first = await embedder.aembed("query")
+            second = await embedder.aembed("query")
+            third = await embedder.aembed("query")
+            return first, second, third
+        
+        first, second, third = asyncio.run(run())
+        assert first is None
+        assert second.tolist() == third.tolist() == [1.0, 0.0]
+        assert FakeEmbeddings.calls == 2
+
+
+class TestRAGPipeline:
+    """Tests for RAGPipeline lifecycle."""
+    
+    def test_open_recreates_closed_search_client(self, monkeypatch):
+        """Test a search client closed by one lifespan is usable by the next."""
+        monkeypatch.setenv("SEARCH_ENDPOINT", "https://example.search.windows.net")
+        monkeypatch.setenv("SEARCH_KEY", "key")
+        pipeline = RAGPipeline()
+        
+        async def lifespan():
+            pipeline.open()
+            # Opening the client opens its transport, which fails once closed
+            await pipeline.search_client.__aenter__()
+            await pipeline.close()
+        
+        asyncio.run(lifespan())
+        asyncio.run(lifespan())
 
 
 if __name__ == "__main__":